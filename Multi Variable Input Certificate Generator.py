@@ -1,9 +1,43 @@
-import textwrap
+import numpy as np
 import pandas as pd
-from PIL import ImageFont, ImageDraw, Image
+from PIL import ImageFont, ImageDraw, Image, ImageColor
+import io
 import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import img2pdf
 
+# PyMuPDF is only needed for emit_png=False
+try:
+    import pymupdf
+except ImportError:
+    pymupdf = None
+
+# libspng encoder, only needed for png_encoder='spng'. It ships in the
+# pyspng-seunglab build; the plain pyspng package can only decode.
+try:
+    from pyspng import encode as spng_encode
+except ImportError:
+    spng_encode = None
+
+# Progress bar if tqdm is installed; without it only errors are printed
+try:
+    from tqdm import tqdm
+except ImportError:
+    tqdm = None
+
+# Rows sent to a worker process per task: enough to amortise the pickling
+# round trip, small enough to keep all workers busy near the end of a batch
+WORKER_CHUNK_SIZE = 8
+
+# Image modes where pasting a colour through an antialiased 'L' mask gives
+# the same pixels as draw.text. Palette and bilevel images take draw.text,
+# which picks palette entries and skips antialiasing.
+MASK_MODES = ('L', 'LA', 'RGB', 'RGBA')
+
+# Scratch drawing context, only used to measure multiline text
+_measure_draw = ImageDraw.Draw(Image.new('L', (1, 1)))
+
 class CertificateGenerator:
     def __init__(self, 
                  template_single_line_path, 
@@ -14,28 +48,68 @@ class CertificateGenerator:
                  colors,
                  max_line_width=95,
                  coordinates=None,
-                 line_spacing=20):
+                 line_spacing=20,
+                 max_workers=None,
+                 parallel_threshold=16,
+                 png_compress_level=1,
+                 io_workers=4,
+                 combined_pdf=None,
+                 emit_png=True,
+                 png_encoder='pillow'):
         """
         Initialize Certificate Generator with templates and configuration
         """
-        # Load templates
+        # Load templates; the paths let worker processes reopen them
+        self.template_paths = (template_single_line_path, template_two_line_path)
         self.template_single_line = Image.open(template_single_line_path)
         self.template_two_line = Image.open(template_two_line_path)
         
+        # Working buffers reused across certificates, keyed by is_single_line.
+        # A buffer is returned here once its certificate has been saved.
+        self._free_buffers = {True: [], False: []}
+        
         # Load Excel data
         self.df = pd.read_excel(excel_path)
         
+        # Resolve column names once; errors are reported by generate_certificates
+        try:
+            self._cols = self._resolve_columns()
+        except KeyError as e:
+            self._cols = None
+            self._column_error = e
+        
         # Create output directories if they don't exist
         os.makedirs(output_dir, exist_ok=True)
-        os.makedirs(os.path.join(output_dir, 'png'), exist_ok=True)
+        if emit_png:
+            os.makedirs(os.path.join(output_dir, 'png'), exist_ok=True)
         os.makedirs(os.path.join(output_dir, 'pdf'), exist_ok=True)
         
         # Store configuration
         self.output_dir = output_dir
         self.fonts = fonts
         self.colors = colors
-        self.max_line_width = max_line_width
         self.line_spacing = line_spacing
+        self.max_workers = max_workers
+        self.parallel_threshold = parallel_threshold
+        # zlib level for PNG output; 1 is much faster than Pillow's default 6
+        self.png_compress_level = png_compress_level
+        # Threads saving finished certificates while the next one is drawn;
+        # only used when rendering in-process
+        self.io_workers = io_workers
+        # File name, inside the pdf folder, for one PDF with every certificate
+        self.combined_pdf = combined_pdf
+        # Without PNGs, certificates are drawn straight into PDFs by PyMuPDF
+        if not emit_png and pymupdf is None:
+            raise ImportError("PyMuPDF is required when emit_png is False")
+        self.emit_png = emit_png
+        self._pdf_resources = None
+        # 'pillow' or 'spng'; spng falls back to Pillow when it is unavailable
+        # or the image mode has no direct array layout
+        self.png_encoder = png_encoder
+        
+        # Text widths and rendered glyph masks keyed by (text, id(font))
+        self._bbox_cache = {}
+        self._mask_cache = {}
         
         # Default coordinates if not provided
         self.coordinates = coordinates or {
@@ -45,37 +119,130 @@ class CertificateGenerator:
             'institute': (906, 765),
             'participant_type': (239, 777)
         }
+        
+        # Pixel budget for one line of paper title: max_line_width characters
+        # of the title font, and never wider than the template allows around
+        # either title anchor
+        title_font = self.fonts['paper_title']
+        sample = "the quick brown fox jumps over the lazy dog"
+        self.max_title_width = min(
+            int(max_line_width * title_font.getlength(sample) / len(sample)),
+            self._anchor_span(self.template_single_line,
+                              self.coordinates['paper_title_single_line'][0]),
+            self._anchor_span(self.template_two_line,
+                              self.coordinates['paper_title_multi_line'][0])
+        )
 
-    def _wrap_paper_title(self, paper_title):
+    def _anchor_span(self, template, x):
         """
-        Wrap paper title based on maximum line width
+        Widest line that, centred at x, stays inside the template
+        """
+        return 2 * min(x, template.width - x)
+
+    def _wrap_paper_title(self, paper_title, font, max_px):
+        """
+        Wrap paper title word by word so each line fits within max_px pixels
         
         Returns:
         - wrapped lines
         - template
         - boolean indicating if title is single-line
         """
-        # If title is short, use single-line template
-        if len(paper_title) <= self.max_line_width:
+        words = paper_title.split()
+        if not words:
             return [paper_title], self.template_single_line, True
+
+        wrapped_lines = []
+        current_line = words[0]
+        current_width = font.getlength(current_line)
+        for word in words[1:]:
+            candidate = f"{current_line} {word}"
+            candidate_width = font.getlength(candidate)
+            if candidate_width <= max_px:
+                current_line, current_width = candidate, candidate_width
+            else:
+                wrapped_lines.append(current_line)
+                # Reuse the measurement when the line is drawn
+                self._bbox_cache[(current_line, id(font))] = int(current_width)
+                current_line = word
+                current_width = font.getlength(word)
+        wrapped_lines.append(current_line)
+        self._bbox_cache[(current_line, id(font))] = int(current_width)
+
+        # If title fits on one line, use single-line template
+        if len(wrapped_lines) == 1:
+            return wrapped_lines, self.template_single_line, True
         
-        # If title is long, wrap and use two-line template
-        wrapped_lines = textwrap.wrap(paper_title, width=self.max_line_width)
+        # If title is long, use two-line template
         return wrapped_lines, self.template_two_line, False
 
-    def _draw_text_centered(self, draw, text, font, x, y, color):
+    def _draw_text_centered(self, image, text, font, x, y, color, cache=False):
         """
         Draw text centered at given coordinates
+        
+        Set cache for fields that repeat across rows to keep their glyph
+        mask instead of rendering the text again. Templates outside
+        MASK_MODES are drawn on directly.
         """
-        # Calculate text bbox to center it
-        text_bbox = draw.textbbox((0, 0), text, font=font)
-        text_width = text_bbox[2] - text_bbox[0]
-        position = (x - text_width // 2, y)
-        draw.text(position, text, font=font, fill=color)
+        position = (x - self._text_width(text, font) // 2, y)
+        if image.mode not in MASK_MODES:
+            ImageDraw.Draw(image).text(position, text, font=font, fill=color)
+            return
+        self._draw_masked(image, text, font, position[0], position[1], color, cache)
 
-    def generate_certificates(self):
+    def _text_width(self, text, font):
         """
-        Generate certificates for all participants in the Excel sheet
+        Width of text in pixels, cached by (text, id(font))
+        """
+        # Names of institutes and participant types repeat across rows so
+        # most lookups are cache hits
+        key = (text, id(font))
+        text_width = self._bbox_cache.get(key)
+        if text_width is None:
+            if '\n' in text:
+                # Cells with line breaks (Alt+Enter in Excel) are centred on
+                # their widest line, as draw.text lays them out
+                left, _, right, _ = self._text_bbox(text, font)
+                text_width = right - left
+            else:
+                text_width = int(font.getlength(text))
+            self._bbox_cache[key] = text_width
+        return text_width
+
+    def _text_bbox(self, text, font):
+        """
+        Bounding box of text drawn at (0, 0), including every line
+        """
+        if '\n' in text:
+            return _measure_draw.multiline_textbbox((0, 0), text, font=font)
+        return font.getbbox(text)
+
+    def _draw_masked(self, image, text, font, x, y, color, cache=False):
+        """
+        Paste text at (x, y) through a glyph mask sized to the text
+        
+        Only the text's bounding box of the certificate is touched. With
+        cache, the mask is kept for the next row with the same text.
+        """
+        key = (text, id(font))
+        masked = self._mask_cache.get(key) if cache else None
+        if masked is None:
+            # Render the text into a small mask cropped to its bounding box
+            left, top, right, bottom = self._text_bbox(text, font)
+            mask = Image.new('L', (max(right - left, 1), max(bottom - top, 1)), 0)
+            ImageDraw.Draw(mask).text((-left, -top), text, font=font, fill=255)
+            masked = (mask, left, top)
+            if cache:
+                self._mask_cache[key] = masked
+        mask, left, top = masked
+        image.paste(color, (x + left, y + top), mask)
+
+    def _resolve_columns(self):
+        """
+        Find the Excel column used for each certificate field
+        
+        Returns a dict of field -> column name; participant_type maps to
+        None when the sheet has no such column.
         """
         # Mapping of potential column names
         column_mapping = {
@@ -93,105 +260,435 @@ class CertificateGenerator:
                     return possible_col
             raise KeyError(f"Could not find a column for {key}")
 
+        columns = {
+            'participant_name': find_column('participant_name'),
+            'institute': find_column('institute'),
+            'participant_type': None,
+            'paper_title': find_column('paper_title'),
+            'paper_id': find_column('paper_id')
+        }
+
+        # Participant type is optional
         try:
-            # Find the correct column names
-            participant_name_col = find_column('participant_name')
-            institute_col = find_column('institute')
-            paper_title_col = find_column('paper_title')
-            paper_id_col = find_column('paper_id')
-            
-            # Participant type is optional
-            try:
-                participant_type_col = find_column('participant_type')
-            except KeyError:
-                participant_type_col = None
+            columns['participant_type'] = find_column('participant_type')
+        except KeyError:
+            pass
 
-        except KeyError as e:
-            print(f"Error: {e}")
+        return columns
+
+    def generate_certificates(self):
+        """
+        Generate certificates for all participants in the Excel sheet
+        """
+        if self._cols is None:
+            print(f"Error: {self._column_error}")
             print("Available columns:", list(self.df.columns))
             return
 
-        for index, row in self.df.iterrows():
-            # Extract participant details
-            participant_name = row[participant_name_col]
-            institute = row[institute_col]
-            paper_title = row[paper_title_col]
-            paper_id = row[paper_id_col]
+        # Participant type is optional; missing columns and empty cells
+        # both fall back to 'Participant'
+        participant_type_col = self._cols['participant_type']
+        if participant_type_col:
+            ptypes = self.df[participant_type_col].fillna('Participant').astype(str).to_numpy()
+        else:
+            ptypes = np.full(len(self.df), 'Participant')
+
+        # Select the columns in _render_certificate argument order and clean
+        # them in one pass: empty cells become '' and everything is a string
+        present = [self._cols[key] for key in ('participant_name', 'institute',
+                                               'paper_title', 'paper_id')]
+        df2 = self.df[present].fillna('').astype(str)
+        df2.insert(2, 'participant_type', ptypes)
+
+        # Output files are named after the paper ID, so rows without one
+        # would all write to the same hidden .png/.pdf; skip and report them
+        missing_id = (df2[self._cols['paper_id']].str.strip() == '').to_numpy()
+        for position in np.flatnonzero(missing_id):
+            # Sheet rows are 1-based with the header in row 1
+            print(f"Error: row {position + 2} has no paper ID; certificate skipped")
+        df2 = df2[~missing_id]
+
+        # Plain tuples are the cheapest rows itertuples can produce
+        rows = list(df2.itertuples(index=False, name=None))
+
+        results = self._iter_results(rows)
+        report_error = print
+        if tqdm is not None:
+            results = tqdm(results, total=len(rows), unit="certificate")
+            # Keep error lines from breaking up the progress bar
+            report_error = tqdm.write
+
+        # Only errors are printed per row; a print per certificate costs a
+        # console write each time
+        combined_pages = []
+        generated = 0
+        for error, page_bytes in results:
+            if error is None:
+                generated += 1
+            else:
+                report_error(error)
+            if page_bytes is not None:
+                combined_pages.append(page_bytes)
+        print(f"Certificates generated: {generated} of {len(self.df)}")
+
+        if self.combined_pdf and combined_pages:
+            combined_pdf_path = os.path.join(self.output_dir, 'pdf', self.combined_pdf)
+            try:
+                if self.emit_png:
+                    # One img2pdf call over the in-memory PNGs
+                    with open(combined_pdf_path, "wb") as pdf_file:
+                        pdf_file.write(img2pdf.convert(combined_pages))
+                else:
+                    # Merge the per-certificate PDFs; garbage=4 compares stream
+                    # contents, so the template images and fonts repeated on
+                    # every page are stored once
+                    combined = pymupdf.open()
+                    for pdf_bytes in combined_pages:
+                        with pymupdf.open("pdf", pdf_bytes) as certificate:
+                            combined.insert_pdf(certificate)
+                    combined.save(combined_pdf_path, garbage=4, deflate=True)
+                    combined.close()
+                print(f"Combined PDF generated: {combined_pdf_path}")
+            except Exception as e:
+                print(f"Error building combined PDF: {e}")
+
+    def _iter_results(self, rows):
+        """
+        Render all rows, in worker processes for larger batches
+        
+        Yields (error, page_bytes) per certificate, in row order.
+        """
+        # Small batches are rendered in-process; process start-up costs more
+        # than it saves there
+        if len(rows) >= self.parallel_threshold:
+            chunks = [rows[i:i + WORKER_CHUNK_SIZE]
+                      for i in range(0, len(rows), WORKER_CHUNK_SIZE)]
+            # max_workers=None lets the executor pick its default, which
+            # respects the 61-process limit on Windows
+            with ProcessPoolExecutor(max_workers=self.max_workers,
+                                     initializer=_init_worker,
+                                     initargs=self._worker_initargs()) as executor:
+                for results in executor.map(_render_chunk, chunks):
+                    yield from results
+        else:
+            yield from self._render_rows(rows)
+
+    def _render_rows(self, rows):
+        """
+        Render rows one after another while a thread pool saves finished ones
+        
+        Yields (error, page_bytes) per certificate, in row order.
+        """
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=self.io_workers) as io_pool:
+            for row in rows:
+                if self.emit_png:
+                    image, is_single_line, paper_id = self._render_certificate(*row)
+                    future = io_pool.submit(self._save_certificate, image, paper_id)
+                    pending.append((future, image, is_single_line))
+                else:
+                    pdf_bytes, paper_id = self._render_certificate_pdf(*row)
+                    future = io_pool.submit(self._save_pdf, pdf_bytes, paper_id)
+                    pending.append((future, None, None))
+
+                # Bound the number of certificates held in memory
+                while len(pending) > self.io_workers:
+                    yield self._collect_saved(*pending.popleft())
+
+            while pending:
+                yield self._collect_saved(*pending.popleft())
+
+    def _render_rows_inline(self, rows):
+        """
+        Render and save rows one after another on the calling thread
+        
+        Used inside worker processes, where the other processes already keep
+        every core busy and extra I/O threads would only compete for them.
+        Yields (error, page_bytes) per certificate, in row order.
+        """
+        for row in rows:
+            if self.emit_png:
+                image, is_single_line, paper_id = self._render_certificate(*row)
+                result = self._save_certificate(image, paper_id)
+                self._free_buffers[is_single_line].append(image)
+            else:
+                pdf_bytes, paper_id = self._render_certificate_pdf(*row)
+                result = self._save_pdf(pdf_bytes, paper_id)
+            yield result
+
+    def _collect_saved(self, future, image, is_single_line):
+        """
+        Wait for a certificate to be saved and recycle its buffer
+        """
+        result = future.result()
+        if image is not None:
+            self._free_buffers[is_single_line].append(image)
+        return result
+
+    def _layout_fields(self, participant_name, institute, participant_type,
+                       wrapped_title, is_single_line):
+        """
+        Place every text field of a certificate
+        
+        Returns (field, text, x, y) tuples, where field keys fonts and colors
+        and (x, y) is the top centre of the text.
+        """
+        fields = [
+            ('participant', participant_name, *self.coordinates['participant_name']),
+            ('institute', institute, *self.coordinates['institute']),
+            ('participant_type', participant_type, *self.coordinates['participant_type'])
+        ]
+
+        # Select coordinates based on title length
+        title_coordinates = (
+            self.coordinates['paper_title_single_line'] if is_single_line 
+            else self.coordinates['paper_title_multi_line']
+        )
 
-            # Handle participant type (optional)
-            participant_type = row[participant_type_col] if participant_type_col else "Participant"
+        # Place wrapped paper title
+        current_y = title_coordinates[1]
+        for line in wrapped_title:
+            fields.append(('paper_title', line, title_coordinates[0], current_y))
+            # Use font's font size instead of deprecated getsize method
+            current_y += self.fonts['paper_title'].size + self.line_spacing
 
-            # Wrap paper title and select appropriate template
-            wrapped_title, template, is_single_line = self._wrap_paper_title(str(paper_title))
+        return fields
 
-            # Create a copy of the template
+    def _render_certificate(self, participant_name, institute, participant_type,
+                            paper_title, paper_id):
+        """
+        Render a single certificate into a working buffer
+        
+        Returns the image, whether the single-line template was used, and
+        the paper ID. The image must go back to _free_buffers once saved.
+        """
+        # Wrap paper title and select appropriate template
+        wrapped_title, template, is_single_line = self._wrap_paper_title(
+            paper_title, self.fonts['paper_title'], self.max_title_width)
+
+        # Reset a free working buffer for this template instead of copying it
+        free_buffers = self._free_buffers[is_single_line]
+        if free_buffers:
+            image = free_buffers.pop()
+            image.paste(template, (0, 0))
+        else:
             image = template.copy()
-            draw = ImageDraw.Draw(image)
 
-            # Draw centered texts
+        # Draw centered texts; institute and participant type repeat across
+        # rows, so they go through the glyph mask cache
+        for field, text, x, y in self._layout_fields(
+                participant_name, institute, participant_type,
+                wrapped_title, is_single_line):
             self._draw_text_centered(
-                draw, 
-                str(participant_name), 
-                self.fonts['participant'], 
-                self.coordinates['participant_name'][0], 
-                self.coordinates['participant_name'][1], 
-                self.colors['participant']
+                image, 
+                text, 
+                self.fonts[field], 
+                x, 
+                y, 
+                self.colors[field],
+                cache=field in ('institute', 'participant_type')
             )
 
-            self._draw_text_centered(
-                draw, 
-                str(institute), 
-                self.fonts['institute'], 
-                self.coordinates['institute'][0], 
-                self.coordinates['institute'][1], 
-                self.colors['institute']
-            )
+        return image, is_single_line, paper_id
+
+    def _render_certificate_pdf(self, participant_name, institute, participant_type,
+                                paper_title, paper_id):
+        """
+        Render a single certificate straight to PDF with PyMuPDF
+        
+        Text is drawn as vector text over the template page, so no PNG is
+        encoded. Returns the PDF bytes and the paper ID.
+        """
+        wrapped_title, _, is_single_line = self._wrap_paper_title(
+            paper_title, self.fonts['paper_title'], self.max_title_width)
 
-            # Only draw participant type if it exists
-            if participant_type_col:
-                self._draw_text_centered(
-                    draw, 
-                    str(participant_type), 
-                    self.fonts['participant_type'], 
-                    self.coordinates['participant_type'][0], 
-                    self.coordinates['participant_type'][1], 
-                    self.colors['participant_type']
-                )
-
-            # Select coordinates based on title length
-            title_coordinates = (
-                self.coordinates['paper_title_single_line'] if is_single_line 
-                else self.coordinates['paper_title_multi_line']
+        resources = self._get_pdf_resources()
+        template_pdf, scale = resources['templates'][is_single_line]
+        doc = pymupdf.open("pdf", template_pdf)
+        page = doc[0]
+
+        for field, text, x, y in self._layout_fields(
+                participant_name, institute, participant_type,
+                wrapped_title, is_single_line):
+            font = self.fonts[field]
+            left = x - self._text_width(text, font) // 2
+            # PIL positions text by its top, PyMuPDF by its baseline
+            baseline = y + font.getmetrics()[0]
+            page.insert_text(
+                (left * scale, baseline * scale),
+                text,
+                fontsize=font.size * scale,
+                fontname=resources['font_names'][field],
+                fontfile=font.path,
+                color=resources['colors'][field]
             )
 
-            # Draw wrapped paper title
-            current_y = title_coordinates[1]
-            for line in wrapped_title:
-                self._draw_text_centered(
-                    draw, 
-                    line, 
-                    self.fonts['paper_title'], 
-                    title_coordinates[0], 
-                    current_y, 
-                    self.colors['paper_title']
-                )
-                # Use font's font size instead of deprecated getsize method
-                current_y += self.fonts['paper_title'].size + self.line_spacing
-
-            # Save the PNG certificate
-            png_output_path = os.path.join(self.output_dir, 'png', f"{paper_id}.png")
-            pdf_output_path = os.path.join(self.output_dir, 'pdf', f"{paper_id}.pdf")
-            
-            # Save PNG
-            image.save(png_output_path)
-            
-            # Convert PNG to PDF
-            try:
-                with open(pdf_output_path, "wb") as pdf_file:
-                    pdf_file.write(img2pdf.convert(png_output_path))
-                print(f"Certificate generated for: {paper_id} (PNG and PDF)")
-            except Exception as e:
-                print(f"Error converting {paper_id} to PDF: {e}")
+        pdf_bytes = doc.tobytes(deflate=True)
+        doc.close()
+        return pdf_bytes, paper_id
+
+    def _get_pdf_resources(self):
+        """
+        Build the per-process PyMuPDF state on first use
+        
+        Each template becomes a one-page PDF so rows only copy an already
+        compressed image instead of embedding the template again.
+        """
+        if self._pdf_resources is not None:
+            return self._pdf_resources
+
+        templates = {}
+        for is_single_line, template in ((True, self.template_single_line),
+                                         (False, self.template_two_line)):
+            # Match img2pdf's page size, which assumes 96 dpi when unset
+            scale = 72 / template.info.get('dpi', (96, 96))[0]
+            png_buffer = io.BytesIO()
+            template.save(png_buffer, format='PNG', compress_level=self.png_compress_level)
+            doc = pymupdf.open()
+            page = doc.new_page(width=template.width * scale, height=template.height * scale)
+            page.insert_image(page.rect, stream=png_buffer.getvalue())
+            templates[is_single_line] = (doc.tobytes(deflate=True), scale)
+            doc.close()
+
+        # One PDF font name per font file, so shared files are embedded once
+        paths = {}
+        font_names = {
+            field: paths.setdefault(font.path, f"F{len(paths)}")
+            for field, font in self.fonts.items()
+        }
+
+        colors = {field: self._pdf_color(color) for field, color in self.colors.items()}
+
+        self._pdf_resources = {
+            'templates': templates,
+            'font_names': font_names,
+            'colors': colors
+        }
+        return self._pdf_resources
+
+    def _pdf_color(self, color):
+        """
+        Convert a Pillow fill colour to PyMuPDF's 0-1 RGB floats
+        
+        Accepts the colour forms the Pillow path does: colour strings,
+        RGB(A) tuples, and grey levels as an int or short tuple.
+        """
+        if isinstance(color, str):
+            color = ImageColor.getrgb(color)
+        elif isinstance(color, int):
+            color = (color,)
+        if len(color) < 3:
+            color = (color[0],) * 3
+        return tuple(channel / 255 for channel in color[:3])
+
+    def _save_certificate(self, image, paper_id):
+        """
+        Save a rendered certificate as PNG and PDF
+        
+        Runs on the I/O thread pool in-process, or inline inside worker
+        processes. Returns an error message or None, and the PNG bytes
+        when they are needed for the combined PDF, otherwise None.
+        """
+        # Save the PNG certificate
+        png_output_path = os.path.join(self.output_dir, 'png', f"{paper_id}.png")
+        pdf_output_path = os.path.join(self.output_dir, 'pdf', f"{paper_id}.pdf")
+        
+        # Encode the PNG once in memory
+        png_bytes = self._encode_png(image)
+        
+        # Save PNG
+        with open(png_output_path, "wb") as png_file:
+            png_file.write(png_bytes)
+        
+        # Only hand the bytes back when the combined PDF needs them
+        page = png_bytes if self.combined_pdf else None
+        
+        # Convert PNG to PDF from the same bytes instead of re-reading the file
+        try:
+            with open(pdf_output_path, "wb") as pdf_file:
+                pdf_file.write(img2pdf.convert(png_bytes))
+            return None, page
+        except Exception as e:
+            return f"Error converting {paper_id} to PDF: {e}", page
+
+    def _encode_png(self, image):
+        """
+        Encode a certificate as PNG bytes with the configured encoder
+        """
+        if (self.png_encoder == 'spng' and spng_encode is not None
+                and image.mode in ('L', 'LA', 'RGB', 'RGBA')):
+            return spng_encode(np.asarray(image), compress_level=self.png_compress_level)
+
+        png_buffer = io.BytesIO()
+        image.save(png_buffer, format='PNG', optimize=False, compress_level=self.png_compress_level)
+        return png_buffer.getvalue()
+
+    def _save_pdf(self, pdf_bytes, paper_id):
+        """
+        Save a certificate rendered by _render_certificate_pdf
+        
+        Runs on the I/O thread pool in-process, or inline inside worker
+        processes. Returns an error message or None, and the PDF bytes
+        when they are needed for the combined PDF, otherwise None.
+        """
+        pdf_output_path = os.path.join(self.output_dir, 'pdf', f"{paper_id}.pdf")
+        page = pdf_bytes if self.combined_pdf else None
+        try:
+            with open(pdf_output_path, "wb") as pdf_file:
+                pdf_file.write(pdf_bytes)
+            return None, page
+        except Exception as e:
+            return f"Error converting {paper_id} to PDF: {e}", page
+
+    def _worker_initargs(self):
+        """
+        Arguments for _init_worker
+        
+        Templates travel as paths and fonts as the arguments they were
+        loaded with; each worker opens them, rather than pickling their
+        pixel data and font objects.
+        """
+        font_specs = {
+            field: (font.path, font.size, font.index, font.encoding, font.layout_engine)
+            for field, font in self.fonts.items()
+        }
+        return self, self.template_paths, font_specs
+
+    def __getstate__(self):
+        # Workers only render; leave the spreadsheet, templates, fonts and
+        # working buffers behind. _init_worker reopens templates and fonts.
+        state = self.__dict__.copy()
+        del state['df'], state['template_single_line'], state['template_two_line']
+        del state['fonts']
+        state['_free_buffers'] = {True: [], False: []}
+        # Font ids are not stable across processes
+        state['_bbox_cache'] = {}
+        state['_mask_cache'] = {}
+        # PyMuPDF objects are rebuilt in each process
+        state['_pdf_resources'] = None
+        return state
+
+# Generator used by the current worker process, set by _init_worker
+_worker_state = {}
+
+def _init_worker(generator, template_paths, font_specs):
+    """
+    Open templates and fonts once per worker process and store the generator
+    """
+    generator.template_single_line = Image.open(template_paths[0])
+    generator.template_two_line = Image.open(template_paths[1])
+    generator.fonts = {
+        field: ImageFont.truetype(path, size, index=index, encoding=encoding,
+                                  layout_engine=layout_engine)
+        for field, (path, size, index, encoding, layout_engine) in font_specs.items()
+    }
+    _worker_state['generator'] = generator
+
+def _render_chunk(rows):
+    """
+    Render a chunk of certificate rows inside a worker process
+    """
+    return list(_worker_state['generator']._render_rows_inline(rows))
 
 # Main execution remains the same
 def main():
@@ -234,7 +731,7 @@ def main():
         output_dir,
         fonts,
         colors,
-        max_line_width=95,  # Maximum characters per line for paper title
+        max_line_width=95,  # Paper title line width, in average characters of its font
         coordinates=coordinates,
         line_spacing=20
     )